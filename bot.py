@@ -1,13 +1,23 @@
 import os
 import logging
 from dotenv import load_dotenv
-from telegram.ext import Updater, CommandHandler, ConversationHandler, MessageHandler, Filters, CallbackQueryHandler
+from telegram.ext import Updater, CommandHandler, ConversationHandler, MessageHandler, Filters, CallbackQueryHandler, Defaults
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import RetryAfter
 import requests
+import orjson
 import mysql.connector
+import redis
+import concurrent.futures
 from pusher import Pusher
 import threading
 import re
+import uuid
+import functools
+import queue
+import time
+import collections
+from cachetools import TTLCache
 from datetime import datetime, timedelta
 
 # Set up logging
@@ -28,6 +38,32 @@ PUSHER_APP_ID = os.getenv("PUSHER_APP_ID")
 PUSHER_SECRET = os.getenv("PUSHER_SECRET")
 BASE_URL = "https://income-api.copperx.io/api"
 
+# Shared HTTP session so every Copperx API call reuses the same keep-alive TLS
+# connection instead of paying a fresh TCP + TLS handshake per request.
+SESSION = requests.Session()
+SESSION.headers["User-Agent"] = "copperx-payout-bot"
+# Pin the accepted encoding to gzip so compressed transfer of the larger
+# payloads (history, wallet lists) doesn't depend on urllib3's default.
+SESSION.headers["Accept-Encoding"] = "gzip"
+SESSION.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=requests.adapters.Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504))
+))
+# (connect, read) timeout: fail fast on an unreachable host without cutting
+# slow-but-alive responses short.
+REQUEST_TIMEOUT = (3.05, 10)
+
+# Shared worker pool for overlapping independent I/O (API calls, DB writes)
+# inside a single handler instead of running them back to back.
+EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+
+# Separate bounded pool for Pusher subscriptions so a slow or wedged Pusher
+# handshake can't eat the workers the request handlers overlap their I/O on.
+PUSHER_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv("PUSHER_WORKERS", "8"))
+)
+
 # MySQL connection
 db_config = {
     "host": os.getenv("MYSQL_HOST"),
@@ -36,15 +72,256 @@ db_config = {
     "database": os.getenv("MYSQL_DB")
 }
 
+def _json(response):
+    """Parse a Copperx response body with orjson, which decodes the raw bytes
+    directly and is several times faster than requests' stdlib json path.
+    Raises ValueError on malformed bodies, matching response.json()."""
+    return orjson.loads(response.content)
+
+def _parse_json(response):
+    """Decode a response body without raising: returns (data, None) on
+    success, or (None, message) with the user-facing error string when the
+    body isn't valid JSON."""
+    try:
+        return orjson.loads(response.content), None
+    except ValueError:
+        return None, "Invalid response from Copperx"
+
+def _transfer_post(url, payload, headers, attempts=3):
+    """POST a transfer with bounded retries and exponential backoff.
+
+    Callers put an Idempotency-Key in the headers, so resending after an
+    ambiguous network failure cannot apply the transfer twice."""
+    for attempt in range(attempts):
+        try:
+            return _request_json("POST", url, payload, headers, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.2 * 2 ** attempt)
+
+def _request_json(method, url, payload, headers, **kwargs):
+    """Issue a request with an orjson-serialized JSON body. Equivalent to
+    SESSION.request(..., json=payload) but orjson emits bytes directly,
+    skipping the stdlib encoder and the intermediate str round-trip."""
+    headers = dict(headers)
+    headers["Content-Type"] = "application/json"
+    return SESSION.request(method, url, data=orjson.dumps(payload), headers=headers, **kwargs)
+
+_MD = "Markdown"
+
+def _md_escape(text):
+    """Escape Markdown control characters in user-supplied values so a
+    recipient like "a_b*c" can't break the surrounding formatting."""
+    return re.sub(r"([_*`\[])", r"\\\1", str(text))
+
+def _reply(update):
+    """Resolve the right reply callable whether the update carries a message
+    or a callback query."""
+    return update.effective_message.reply_text
+
+# Backpressure: when too many handlers are already blocked on I/O, reject new
+# work immediately with a "busy" reply instead of queueing it behind the
+# backlog and letting Telegram retries pile up.
+_BUSY_SEM = threading.BoundedSemaphore(int(os.getenv("MAX_INFLIGHT", "64")))
+
+def _with_backpressure(func):
+    @functools.wraps(func)
+    def wrapper(update, context):
+        if not _BUSY_SEM.acquire(blocking=False):
+            _reply(update)(
+                "⚠️ *The bot is busy right now.* Please try again in a moment.",
+                parse_mode=_MD
+            )
+            return
+        try:
+            return func(update, context)
+        finally:
+            _BUSY_SEM.release()
+    return wrapper
+
+# Per-chat serialization: run_async lets handlers overlap freely, so two
+# rapid taps from the same user could otherwise race (double transfer POSTs,
+# interleaved wallet updates). A lock per chat keeps one user's updates
+# ordered without blocking anyone else; the lock objects are a few dozen
+# bytes each, so the map is left to grow with the user base.
+# Plain dict + setdefault rather than a defaultdict: __missing__ isn't
+# atomic, so two first-time updates from one chat could each build a lock
+# and run unserialized. setdefault resolves the race to a single lock.
+_CHAT_LOCKS = {}
+
+def _per_chat(func):
+    @functools.wraps(func)
+    def wrapper(update, context):
+        with _CHAT_LOCKS.setdefault(update.effective_chat.id, threading.Lock()):
+            return func(update, context)
+    return wrapper
+
+# One audited outer error path for the update handlers. Each of them used to
+# carry its own copy of the same log-and-reply except blocks; the decorator
+# keeps the two replies that actually differ — a connection hint for network
+# failures, a canned apology for everything else — logs the traceback, and
+# hands ``on_error`` back to the dispatcher so conversation steps end cleanly.
+def _safe_handler(op, msg=None, on_error=None):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(update, context):
+            try:
+                return func(update, context)
+            except requests.RequestException as e:
+                logger.error("Network error in %s for user %s: %s", op, update.effective_chat.id, e)
+                _reply(update)(
+                    f"❌ *Network error:* {str(e)}\n"
+                    "Please check your connection and try again.",
+                    parse_mode=_MD
+                )
+            except Exception as e:
+                logger.error("Unexpected error in %s for user %s: %s", op, update.effective_chat.id, e, exc_info=True)
+                _reply(update)(msg or _UNEXPECTED_ERROR_MSG, parse_mode=_MD)
+            return on_error
+        return wrapper
+    return decorator
+
+# Precompiled validators for the login and send flows.
+_EMAIL_RE = re.compile(r"[^@]+@[^@]+\.[^@]+")
+_OTP_RE = re.compile(r"\d{6}\Z")
+
 # Conversation states
 EMAIL, OTP, SEND_TYPE, SEND_RECIPIENT, SEND_AMOUNT, SEND_CONFIRM, WITHDRAW_AMOUNT, WITHDRAW_CONFIRM = range(8)
 
+# Connection pool so handlers reuse warmed connections instead of paying the
+# TCP + auth handshake on every query. close() on a pooled connection just
+# returns it to the pool. Built lazily on first use so a cold start with the
+# database briefly unavailable doesn't kill the process at import time.
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def _get_pool():
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = mysql.connector.pooling.MySQLConnectionPool(
+                    pool_name="copperx",
+                    pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+                    pool_reset_session=True,
+                    **db_config
+                )
+    return _POOL
+
+# Fixed-layout row for the hot-path user lookup; cheaper to materialise and
+# cache than the per-row dict a dictionary cursor allocates.
+UserRow = collections.namedtuple(
+    "UserRow",
+    ["chat_id", "email", "token", "organization_id", "token_expiry", "default_wallet"]
+)
+
+# Short-lived cache of user rows so repeated commands skip the SELECT. The
+# database stays the source of truth; writes invalidate the cached entry.
+_USER_CACHE = TTLCache(maxsize=10000, ttl=int(os.getenv("USER_CACHE_TTL", "300")))
+_USER_CACHE_LOCK = threading.Lock()
+
+# Known-missing chat_ids. Commands from users who never logged in would
+# otherwise fall through the caches to Redis/MySQL on every message; a short
+# negative entry short-circuits those lookups. Login clears the marker.
+_USER_MISS_CACHE = TTLCache(maxsize=10000, ttl=60)
+
+# Optional Redis session store (set REDIS_URL to enable). Sits between the
+# in-process cache and MySQL so sessions survive restarts and can be shared
+# by multiple bot workers; reads fall through to MySQL and writes invalidate.
+REDIS_URL = os.getenv("REDIS_URL")
+_REDIS = redis.Redis.from_url(REDIS_URL, decode_responses=True) if REDIS_URL else None
+_REDIS_USER_TTL = int(os.getenv("REDIS_USER_TTL", "86400"))
+_EXPIRY_FMT = "%Y-%m-%d %H:%M:%S"
+
+def _redis_get_user(chat_id):
+    try:
+        data = _REDIS.hgetall(f"user:{chat_id}")
+    except redis.RedisError as e:
+        logger.warning("Redis read failed for user %s: %s", chat_id, e)
+        return None
+    if not data:
+        return None
+    expiry = data.get("token_expiry") or None
+    if expiry:
+        try:
+            expiry = datetime.strptime(expiry, _EXPIRY_FMT)
+        except ValueError:
+            expiry = None
+    return UserRow(
+        int(data["chat_id"]),
+        data.get("email") or None,
+        data.get("token") or None,
+        data.get("organization_id") or None,
+        expiry,
+        data.get("default_wallet") or None
+    )
+
+def _redis_store_user(user):
+    expiry = user.token_expiry
+    # Expire the session alongside the token itself, so a stale entry can't
+    # outlive the credentials it carries; fall back to the blanket TTL when
+    # no expiry is recorded.
+    ttl = _REDIS_USER_TTL
+    if isinstance(expiry, datetime):
+        remaining = int((expiry - datetime.now()).total_seconds())
+        if remaining <= 0:
+            return
+        ttl = min(ttl, remaining)
+        expiry = expiry.strftime(_EXPIRY_FMT)
+    mapping = {
+        "chat_id": user.chat_id,
+        "email": user.email or "",
+        "token": user.token or "",
+        "organization_id": user.organization_id or "",
+        "token_expiry": expiry or "",
+        "default_wallet": user.default_wallet or ""
+    }
+    try:
+        pipe = _REDIS.pipeline()
+        pipe.hset(f"user:{user.chat_id}", mapping=mapping)
+        pipe.expire(f"user:{user.chat_id}", ttl)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Redis write failed for user %s: %s", user.chat_id, e)
+
+def _redis_drop_user(chat_id):
+    try:
+        _REDIS.delete(f"user:{chat_id}")
+    except redis.RedisError as e:
+        logger.warning("Redis delete failed for user %s: %s", chat_id, e)
+
+# Short-TTL caches for Copperx responses that rarely change within a session,
+# keyed by chat_id. KYC status can stay longer than the wallet list.
+_KYC_CACHE = TTLCache(maxsize=10000, ttl=300)
+_WALLETS_CACHE = TTLCache(maxsize=10000, ttl=60)
+# Balances change with every transfer, so keep this one short and drop the
+# entry whenever a send or withdrawal goes through.
+_BALANCES_CACHE = TTLCache(maxsize=10000, ttl=int(os.getenv("BALANCE_CACHE_TTL", "15")))
+# Same deal for the first history page; transfers and deposits drop it.
+_HISTORY_CACHE = TTLCache(maxsize=10000, ttl=int(os.getenv("HISTORY_CACHE_TTL", "20")))
+_API_CACHE_LOCK = threading.Lock()
+
+# All of these are per-account data keyed by chat_id, so they must not
+# survive the account changing hands: logout and (re-)login drop them,
+# otherwise the next login in the same chat could be served the previous
+# account's KYC status or wallet list for up to a TTL.
+def _drop_api_caches(chat_id):
+    with _API_CACHE_LOCK:
+        _KYC_CACHE.pop(chat_id, None)
+        _WALLETS_CACHE.pop(chat_id, None)
+        _BALANCES_CACHE.pop(chat_id, None)
+        _HISTORY_CACHE.pop(chat_id, None)
+
 # Database helper functions
 def get_db_connection():
     try:
+        return _get_pool().get_connection()
+    except mysql.connector.PoolError as e:
+        logger.warning("Connection pool exhausted, falling back to a direct connection: %s", e)
         return mysql.connector.connect(**db_config)
     except mysql.connector.Error as e:
-        logger.error(f"Database connection error: {e}")
+        logger.error("Database connection error: %s", e)
         raise
 
 def init_db():
@@ -54,25 +331,34 @@ def init_db():
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SHOW TABLES LIKE 'users'")
-        table_exists = cursor.fetchone()
-        if not table_exists:
-            cursor.execute("""
-                CREATE TABLE users (
-                    chat_id BIGINT PRIMARY KEY,
-                    email VARCHAR(255),
-                    token TEXT,
-                    organization_id VARCHAR(255),
-                    token_expiry VARCHAR(50),
-                    default_wallet VARCHAR(255)
-                )
-            """)
-            conn.commit()
-            logger.info("Created 'users' table in the database.")
-        else:
-            logger.info("'users' table already exists in the database.")
+        # token as VARCHAR keeps the row inside the clustered index page
+        # (TEXT is stored off-page, costing a second read per lookup); the
+        # ids are bounded, so narrow VARCHARs keep the row compact.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                chat_id BIGINT PRIMARY KEY,
+                email VARCHAR(255),
+                token VARCHAR(1024),
+                organization_id VARCHAR(64),
+                token_expiry DATETIME,
+                default_wallet VARCHAR(64)
+            ) ENGINE=InnoDB ROW_FORMAT=DYNAMIC
+              CHARACTER SET utf8mb4 COLLATE utf8mb4_bin
+        """)
+        # One-time migrations for databases created with the old layout;
+        # MySQL converts the stored values in place.
+        for migration in (
+            "ALTER TABLE users MODIFY token_expiry DATETIME",
+            "ALTER TABLE users MODIFY token VARCHAR(1024)",
+        ):
+            try:
+                cursor.execute(migration)
+            except mysql.connector.Error as e:
+                logger.warning("Migration %r skipped: %s", migration, e)
+        conn.commit()
+        logger.info("'users' table is ready.")
     except mysql.connector.Error as e:
-        logger.error(f"Error initializing database: {e}")
+        logger.error("Error initializing database: %s", e)
         raise
     finally:
         cursor.close()
@@ -82,27 +368,78 @@ def save_user(chat_id, email, token, organization_id=None, token_expiry=None):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
+        # INSERT ... ON DUPLICATE KEY UPDATE does an in-place update on
+        # re-login, unlike REPLACE INTO's delete+insert which also wiped the
+        # user's default_wallet.
         cursor.execute(
-            "REPLACE INTO users (chat_id, email, token, organization_id, token_expiry) VALUES (%s, %s, %s, %s, %s)",
+            "INSERT INTO users (chat_id, email, token, organization_id, token_expiry) "
+            "VALUES (%s, %s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE email = VALUES(email), token = VALUES(token), "
+            "organization_id = VALUES(organization_id), token_expiry = VALUES(token_expiry)",
             (chat_id, email, token, organization_id, token_expiry)
         )
         conn.commit()
+        # Write the fresh row through to the caches when we already hold the
+        # previous one (its default_wallet survives the upsert); otherwise
+        # just invalidate and let the next read repopulate.
+        with _USER_CACHE_LOCK:
+            cached = _USER_CACHE.pop(chat_id, None)
+            _USER_MISS_CACHE.pop(chat_id, None)
+            if cached is not None:
+                cached = cached._replace(
+                    email=email,
+                    token=token,
+                    organization_id=organization_id,
+                    token_expiry=token_expiry
+                )
+                _USER_CACHE[chat_id] = cached
+        if _REDIS is not None:
+            if cached is not None:
+                _redis_store_user(cached)
+            else:
+                _redis_drop_user(chat_id)
+        _drop_api_caches(chat_id)
     except mysql.connector.Error as e:
-        logger.error(f"Error saving user: {e}")
+        logger.error("Error saving user: %s", e)
         raise
     finally:
         cursor.close()
         conn.close()
 
 def get_user(chat_id):
+    with _USER_CACHE_LOCK:
+        user = _USER_CACHE.get(chat_id)
+        if user is None and chat_id in _USER_MISS_CACHE:
+            return None
+    if user is not None:
+        return user
+    if _REDIS is not None:
+        user = _redis_get_user(chat_id)
+        if user is not None:
+            with _USER_CACHE_LOCK:
+                _USER_CACHE[chat_id] = user
+            return user
     conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM users WHERE chat_id = %s", (chat_id,))
-        user = cursor.fetchone()
+        cursor.execute(
+            "SELECT chat_id, email, token, organization_id, token_expiry, default_wallet "
+            "FROM users WHERE chat_id = %s",
+            (chat_id,)
+        )
+        row = cursor.fetchone()
+        user = UserRow(*row) if row else None
+        if user is not None:
+            with _USER_CACHE_LOCK:
+                _USER_CACHE[chat_id] = user
+            if _REDIS is not None:
+                _redis_store_user(user)
+        else:
+            with _USER_CACHE_LOCK:
+                _USER_MISS_CACHE[chat_id] = True
         return user
     except mysql.connector.Error as e:
-        logger.error(f"Error fetching user: {e}")
+        logger.error("Error fetching user: %s", e)
         raise
     finally:
         cursor.close()
@@ -114,8 +451,18 @@ def update_default_wallet(chat_id, wallet_id):
     try:
         cursor.execute("UPDATE users SET default_wallet = %s WHERE chat_id = %s", (wallet_id, chat_id))
         conn.commit()
+        with _USER_CACHE_LOCK:
+            cached = _USER_CACHE.pop(chat_id, None)
+            if cached is not None:
+                cached = cached._replace(default_wallet=wallet_id)
+                _USER_CACHE[chat_id] = cached
+        if _REDIS is not None:
+            if cached is not None:
+                _redis_store_user(cached)
+            else:
+                _redis_drop_user(chat_id)
     except mysql.connector.Error as e:
-        logger.error(f"Error updating default wallet: {e}")
+        logger.error("Error updating default wallet: %s", e)
         raise
     finally:
         cursor.close()
@@ -124,1002 +471,1034 @@ def update_default_wallet(chat_id, wallet_id):
 # Token refresh (basic implementation)
 def refresh_token_if_needed(user, chat_id, reply_func):
     if not user:
-        logger.warning(f"No user found for chat_id {chat_id}")
+        logger.warning("No user found for chat_id %s", chat_id)
         reply_func("⚠️ Please /login to continue.")
         return None
-    if not user.get("token_expiry"):
-        logger.warning(f"No token expiry found for user {chat_id}")
+    if not user.token_expiry:
+        logger.warning("No token expiry found for user %s", chat_id)
         reply_func("⚠️ Please /login to continue.")
         return None
-    try:
-        expiry = datetime.strptime(user["token_expiry"], "%Y-%m-%d %H:%M:%S")
-        if datetime.now() >= expiry:
-            logger.info(f"Token expired for user {chat_id}, expiry: {user['token_expiry']}")
-            reply_func("⚠️ Your session has expired. Please /login again to continue.")
-            return None
-        logger.info(f"Token is valid for user {chat_id}, expiry: {user['token_expiry']}")
-        return user
-    except ValueError as e:
-        logger.error(f"Error parsing token expiry for user {chat_id}: {e}")
-        reply_func("⚠️ Session error. Please /login again.")
+    expiry = user.token_expiry
+    if datetime.now() >= expiry:
+        logger.info("Token expired for user %s, expiry: %s", chat_id, expiry)
+        reply_func("⚠️ Your session has expired. Please /login again to continue.")
         return None
+    logger.info("Token is valid for user %s, expiry: %s", chat_id, expiry)
+    return user
 
-# Command menu as inline keyboard
-def get_command_menu():
-    keyboard = [
-        [
-            InlineKeyboardButton("Login", callback_data="cmd_login"),
-            InlineKeyboardButton("Profile", callback_data="cmd_profile"),
-            InlineKeyboardButton("KYC", callback_data="cmd_kyc")
-        ],
-        [
-            InlineKeyboardButton("Balance", callback_data="cmd_balance"),
-            InlineKeyboardButton("Set Default", callback_data="cmd_setdefault"),
-            InlineKeyboardButton("Deposit", callback_data="cmd_deposit")
-        ],
-        [
-            InlineKeyboardButton("History", callback_data="cmd_history"),
-            InlineKeyboardButton("Send", callback_data="cmd_send"),
-            InlineKeyboardButton("Withdraw", callback_data="cmd_withdraw")
-        ],
-        [
-            InlineKeyboardButton("Help", callback_data="cmd_help")
-        ]
+def _auth_required(func):
+    """Resolve and validate the session once before the handler body runs.
+
+    The row lands in context.user_data["_user"]; when there is no live
+    session the user has already been told to /login and the handler is
+    skipped (ConversationHandler.END is a harmless -1 for plain handlers)."""
+    @functools.wraps(func)
+    def wrapper(update, context):
+        chat_id = update.effective_chat.id
+        user = refresh_token_if_needed(get_user(chat_id), chat_id, _reply(update))
+        if not user:
+            return ConversationHandler.END
+        context.user_data["_user"] = user
+        return func(update, context)
+    return wrapper
+
+# Command menu as inline keyboard. Built once at import time — the markup is
+# immutable as far as the Bot API is concerned, so one instance is shared by
+# every reply instead of reallocating the buttons per call.
+_COMMAND_MENU = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("Login", callback_data="cmd_login"),
+        InlineKeyboardButton("Profile", callback_data="cmd_profile"),
+        InlineKeyboardButton("KYC", callback_data="cmd_kyc")
+    ],
+    [
+        InlineKeyboardButton("Balance", callback_data="cmd_balance"),
+        InlineKeyboardButton("Set Default", callback_data="cmd_setdefault"),
+        InlineKeyboardButton("Deposit", callback_data="cmd_deposit")
+    ],
+    [
+        InlineKeyboardButton("History", callback_data="cmd_history"),
+        InlineKeyboardButton("Send", callback_data="cmd_send"),
+        InlineKeyboardButton("Withdraw", callback_data="cmd_withdraw")
+    ],
+    [
+        InlineKeyboardButton("Help", callback_data="cmd_help")
     ]
-    return InlineKeyboardMarkup(keyboard)
+])
+
+# Recipient-type keyboard for the /send flow, likewise static.
+_SEND_TYPE_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Email", callback_data="send_email")],
+    [InlineKeyboardButton("Wallet", callback_data="send_wallet")],
+    [InlineKeyboardButton("Cancel", callback_data="send_cancel")]
+])
+
+# Confirm/cancel keyboards for the transfer flows.
+_SEND_CONFIRM_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Confirm", callback_data="send_confirm")],
+    [InlineKeyboardButton("Cancel", callback_data="send_cancel")]
+])
+_WITHDRAW_CONFIRM_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Confirm", callback_data="withdraw_confirm")],
+    [InlineKeyboardButton("Cancel", callback_data="withdraw_cancel")]
+])
+_WITHDRAW_CANCEL_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Cancel", callback_data="withdraw_cancel")]
+])
+
+# Canned error replies repeated across the handlers.
+_ERROR_MSG = "❌ *An error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183"
+_UNEXPECTED_ERROR_MSG = "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183"
+_LOGIN_SESSION_ERR = "❌ *Session error.* Please start the login process again with /login."
+_SEND_SESSION_ERR = "❌ *Session error.* Please start the send process again with /send."
+_WITHDRAW_SESSION_ERR = "❌ *Session error.* Please start the withdraw process again with /withdraw."
+
+# Static body for the /deposit walkthrough.
+_DEPOSIT_MSG = (
+    "💸 *Deposit USDC:*\n\n"
+    "To deposit USDC, please send it to your wallet address on the Copperx platform.\n"
+    "1. Visit https://copperx.io and log in.\n"
+    "2. Navigate to your wallet section.\n"
+    "3. Copy your wallet address and send USDC to it.\n"
+    "4. Use /balance to check your updated balance.\n\n"
+    "You’ll receive a notification here once the deposit is confirmed.\n\n"
+    "Use the menu below to continue:"
+)
+
+def get_command_menu():
+    return _COMMAND_MENU
 
 # Start command
+@_with_backpressure
+@_safe_handler("start", msg=_ERROR_MSG)
 def start(update, context):
-    try:
-        chat_id = update.message.chat_id
-        user = get_user(chat_id)
-        user_name = update.message.from_user.first_name
-        if user:
-            update.message.reply_text(
-                f"👋 *Welcome back, {user_name}!* 🌟\n"
-                f"You’re logged in as {user['email']}. Use the menu below to manage your USDC transactions:",
-                parse_mode="Markdown",
-                reply_markup=get_command_menu()
-            )
-        else:
-            update.message.reply_text(
-                f"🌟 *Welcome to the Copperx Payout Bot, {user_name}!* 🌟\n"
-                "Easily manage your USDC transactions directly in Telegram. To begin, please /login with your Copperx credentials or use /help to explore all available commands.",
-                parse_mode="Markdown",
-                reply_markup=get_command_menu()
-            )
-    except Exception as e:
-        logger.error(f"Error in start command: {e}")
+    chat_id = update.effective_chat.id
+    user = get_user(chat_id)
+    user_name = update.effective_user.first_name
+    if user:
         update.message.reply_text(
-            "❌ *An error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            f"👋 *Welcome back, {user_name}!* 🌟\n"
+            f"You’re logged in as {user.email}. Use the menu below to manage your USDC transactions:",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
+        )
+    else:
+        update.message.reply_text(
+            f"🌟 *Welcome to the Copperx Payout Bot, {user_name}!* 🌟\n"
+            "Easily manage your USDC transactions directly in Telegram. To begin, please /login with your Copperx credentials or use /help to explore all available commands.",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
         )
 
+# Help text is static; build the string once instead of re-concatenating the
+# literals on every /help.
+_HELP_TEXT = (
+    "📋 *Copperx Payout Bot Commands:*\n\n"
+    "🔐 *Account Management*\n"
+    "/start - Start the bot\n"
+    "/login - Log in to Copperx\n"
+    "/logout - Log out of Copperx\n"
+    "/profile - View your account details\n"
+    "/kyc - Check your KYC/KYB status\n\n"
+    "👛 *Wallet Management*\n"
+    "/balance - Check your wallet balances\n"
+    "/setdefault - Set your default wallet\n"
+    "/deposit - Get instructions to deposit USDC\n"
+    "/history - View your last 10 transactions\n\n"
+    "💸 *Fund Transfers*\n"
+    "/send - Send USDC to an email or wallet\n"
+    "/withdraw - Withdraw USDC to your bank\n\n"
+    "/help - Show this message\n\n"
+    "📞 *Support:* https://t.me/copperxcommunity/2183"
+)
+
 # Help command
+@_with_backpressure
+@_safe_handler("help", msg=_ERROR_MSG)
 def help_command(update, context):
-    try:
-        chat_id = update.message.chat_id if update.message else update.callback_query.message.chat_id
-        reply_func = update.message.reply_text if update.message else update.callback_query.message.reply_text
-        reply_func(
-            "📋 *Copperx Payout Bot Commands:*\n\n"
-            "🔐 *Account Management*\n"
-            "/start - Start the bot\n"
-            "/login - Log in to Copperx\n"
-            "/logout - Log out of Copperx\n"
-            "/profile - View your account details\n"
-            "/kyc - Check your KYC/KYB status\n\n"
-            "👛 *Wallet Management*\n"
-            "/balance - Check your wallet balances\n"
-            "/setdefault - Set your default wallet\n"
-            "/deposit - Get instructions to deposit USDC\n"
-            "/history - View your last 10 transactions\n\n"
-            "💸 *Fund Transfers*\n"
-            "/send - Send USDC to an email or wallet\n"
-            "/withdraw - Withdraw USDC to your bank\n\n"
-            "/help - Show this message\n\n"
-            "📞 *Support:* https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown",
-            reply_markup=get_command_menu()
-        )
-    except Exception as e:
-        logger.error(f"Error in help command: {e}")
-        reply_func(
-            "❌ *An error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
-        )
+    chat_id = update.effective_chat.id
+    reply_func = _reply(update)
+    reply_func(
+        _HELP_TEXT,
+        parse_mode=_MD,
+        reply_markup=get_command_menu()
+    )
 
 # Command menu callback
+@_safe_handler("menu_callback", msg=_ERROR_MSG)
 def menu_callback(update, context):
-    try:
-        query = update.callback_query
-        command = query.data.split("_")[1]
-        query.answer()
-        chat_id = query.message.chat_id
-        context.bot.send_message(chat_id=chat_id, text=f"/{command}")
-    except Exception as e:
-        logger.error(f"Error in menu_callback: {e}")
-        query.message.reply_text(
-            "❌ *An error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
-        )
+    query = update.callback_query
+    command = query.data.split("_", 1)[1]
+    query.answer()
+    handler = MENU_DISPATCH.get(command)
+    if handler is not None:
+        handler(update, context)
 
 # Logout command
+@_with_backpressure
 def logout(update, context):
     try:
-        chat_id = update.message.chat_id
-        reply_func = update.message.reply_text
+        chat_id = update.effective_chat.id
+        reply_func = _reply(update)
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("DELETE FROM users WHERE chat_id = %s", (chat_id,))
         conn.commit()
         cursor.close()
         conn.close()
+        with _USER_CACHE_LOCK:
+            _USER_CACHE.pop(chat_id, None)
+        if _REDIS is not None:
+            _redis_drop_user(chat_id)
+        _drop_api_caches(chat_id)
+        _unsubscribe_chat(chat_id)
         reply_func(
             "👋 *Logged out successfully!*\n"
             "You’ve been logged out of Copperx. Use /login to sign in again.\n\n"
             "Use the menu below to continue:",
-            parse_mode="Markdown",
+            parse_mode=_MD,
             reply_markup=get_command_menu()
         )
     except mysql.connector.Error as e:
-        logger.error(f"Error in logout for user {chat_id}: {e}")
+        logger.error("Error in logout for user %s: %s", chat_id, e, exc_info=True)
         reply_func(
             "❌ *Error logging out.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            parse_mode=_MD
         )
     except Exception as e:
-        logger.error(f"Unexpected error in logout for user {chat_id}: {e}")
+        logger.error("Unexpected error in logout for user %s: %s", chat_id, e, exc_info=True)
         reply_func(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            _UNEXPECTED_ERROR_MSG,
+            parse_mode=_MD
         )
 
 # Authentication
+@_safe_handler("login", msg=_ERROR_MSG, on_error=ConversationHandler.END)
 def login(update, context):
-    try:
+    # Entered either as /login or via the cmd_login button; answer the tap
+    # so the client-side spinner doesn't hang until Telegram times it out.
+    if update.callback_query:
+        update.callback_query.answer()
+    _reply(update)(
+        "📧 *Let’s get you logged in!*\n"
+        "Please enter your Copperx email address to receive an OTP:",
+        parse_mode=_MD
+    )
+    return EMAIL
+
+@_safe_handler("get_email", msg=_ERROR_MSG, on_error=ConversationHandler.END)
+def get_email(update, context):
+    email = update.message.text
+    if not _EMAIL_RE.match(email):
         update.message.reply_text(
-            "📧 *Let’s get you logged in!*\n"
-            "Please enter your Copperx email address to receive an OTP:",
-            parse_mode="Markdown"
+            "❌ *Invalid email format.* Please enter a valid email address:",
+            parse_mode=_MD
         )
         return EMAIL
-    except Exception as e:
-        logger.error(f"Error in login command: {e}")
-        update.message.reply_text(
-            "❌ *An error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
-        )
-        return ConversationHandler.END
-
-def get_email(update, context):
-    try:
-        email = update.message.text
-        if not re.match(r"[^@]+@[^@]+\.[^@]+", email):
-            update.message.reply_text(
-                "❌ *Invalid email format.* Please enter a valid email address:",
-                parse_mode="Markdown"
-            )
-            return EMAIL
-        context.user_data["email"] = email
-        headers = {"Authorization": f"Bearer {COPPERX_API_TOKEN}"}
-        logger.info(f"Sending OTP request for email: {email}")
-        response = requests.post(f"{BASE_URL}/auth/email-otp/request", json={"email": email}, headers=headers)
-        logger.info(f"API response status: {response.status_code}, response: {response.text}")
-        if response.status_code == 200:
-            response_data = response.json()
-            sid = response_data.get("sid")
-            if not sid:
-                update.message.reply_text(
-                    "❌ *Error:* No session ID received from Copperx. Please try again or contact support: https://t.me/copperxcommunity/2183",
-                    parse_mode="Markdown"
-                )
-                return ConversationHandler.END
-            context.user_data["sid"] = sid
-            update.message.reply_text(
-                "🔑 *OTP sent!* Please check your email (including spam/junk folder) and enter the 6-digit OTP here:",
-                parse_mode="Markdown"
-            )
-            return OTP
-        elif response.status_code == 429:
-            update.message.reply_text(
-                "⚠️ *Rate limit exceeded.* Please wait a few minutes and try again.",
-                parse_mode="Markdown"
-            )
-            return ConversationHandler.END
-        elif response.status_code == 404:
-            update.message.reply_text(
-                "❌ *Email not found.* Please ensure you’re using the email associated with your Copperx account, or sign up at https://copperx.io.",
-                parse_mode="Markdown"
-            )
-            return ConversationHandler.END
-        else:
+    context.user_data["email"] = email
+    headers = {"Authorization": f"Bearer {COPPERX_API_TOKEN}"}
+    logger.info("Sending OTP request for email: %s", email)
+    response = _request_json("POST", f"{BASE_URL}/auth/email-otp/request", {"email": email}, headers, timeout=REQUEST_TIMEOUT)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("API response status: %s, response: %s", response.status_code, response.text)
+    if response.status_code == 200:
+        response_data = _json(response)
+        sid = response_data.get("sid")
+        if not sid:
             update.message.reply_text(
-                f"❌ *Error sending OTP:* {response.json().get('message', 'Unknown error')}\n"
-                "Please try again or contact support: https://t.me/copperxcommunity/2183",
-                parse_mode="Markdown"
+                "❌ *Error:* No session ID received from Copperx. Please try again or contact support: https://t.me/copperxcommunity/2183",
+                parse_mode=_MD
             )
             return ConversationHandler.END
-    except requests.RequestException as e:
-        logger.error(f"Network error in get_email: {e}")
+        context.user_data["sid"] = sid
+        update.message.reply_text(
+            "🔑 *OTP sent!* Please check your email (including spam/junk folder) and enter the 6-digit OTP here:",
+            parse_mode=_MD
+        )
+        return OTP
+    elif response.status_code == 429:
         update.message.reply_text(
-            f"❌ *Network error:* {str(e)}\n"
-            "Please check your internet connection and try again.",
-            parse_mode="Markdown"
+            "⚠️ *Rate limit exceeded.* Please wait a few minutes and try again.",
+            parse_mode=_MD
         )
         return ConversationHandler.END
-    except Exception as e:
-        logger.error(f"Error in get_email: {e}")
+    elif response.status_code == 404:
+        update.message.reply_text(
+            "❌ *Email not found.* Please ensure you’re using the email associated with your Copperx account, or sign up at https://copperx.io.",
+            parse_mode=_MD
+        )
+        return ConversationHandler.END
+    else:
         update.message.reply_text(
-            "❌ *An error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            f"❌ *Error sending OTP:* {_json(response).get('message', 'Unknown error')}\n"
+            "Please try again or contact support: https://t.me/copperxcommunity/2183",
+            parse_mode=_MD
         )
         return ConversationHandler.END
 
+@_per_chat
+@_safe_handler("verify_otp", msg=_ERROR_MSG, on_error=ConversationHandler.END)
 def verify_otp(update, context):
-    try:
-        otp = update.message.text
-        if not otp.isdigit() or len(otp) != 6:
-            update.message.reply_text(
-                "❌ *Invalid OTP.* It must be a 6-digit number. Please try again:",
-                parse_mode="Markdown"
-            )
-            return OTP
-        email = context.user_data.get("email")
-        sid = context.user_data.get("sid")
-        if not email or not sid:
-            update.message.reply_text(
-                "❌ *Session error.* Please start the login process again with /login.",
-                parse_mode="Markdown"
-            )
-            return ConversationHandler.END
-        chat_id = update.message.chat_id
-        headers = {"Authorization": f"Bearer {COPPERX_API_TOKEN}"}
-        logger.info(f"Verifying OTP for email: {email}, OTP: {otp}, sid: {sid}")
-        response = requests.post(
-            f"{BASE_URL}/auth/email-otp/authenticate",
-            json={"email": email, "otp": otp, "sid": sid},
-            headers=headers
+    otp = update.message.text
+    if not _OTP_RE.match(otp):
+        update.message.reply_text(
+            "❌ *Invalid OTP.* It must be a 6-digit number. Please try again:",
+            parse_mode=_MD
         )
-        logger.info(f"API response status: {response.status_code}, response: {response.text}")
-        if response.status_code == 200:
-            token = response.json().get("accessToken")
-            profile = requests.get(f"{BASE_URL}/auth/me", headers={"Authorization": f"Bearer {token}"}).json()
-            org_id = profile.get("organizationId")
-            token_expiry = (datetime.now() + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
-            save_user(chat_id, email, token, org_id, token_expiry)
-            update.message.reply_text(
-                "✅ *Login successful!* You’re now connected to Copperx.\n"
-                "Use the menu below to manage your USDC transactions:",
-                parse_mode="Markdown",
-                reply_markup=get_command_menu()
-            )
-            start_pusher(chat_id, token, org_id, context)
-            return ConversationHandler.END
-        else:
-            update.message.reply_text(
-                f"❌ *Invalid OTP:* {response.json().get('message', 'Unknown error')}\n"
-                "Please try again or request a new OTP with /login.",
-                parse_mode="Markdown"
-            )
-            return OTP
-    except requests.RequestException as e:
-        logger.error(f"Network error in verify_otp: {e}")
+        return OTP
+    email = context.user_data.get("email")
+    sid = context.user_data.get("sid")
+    if not email or not sid:
         update.message.reply_text(
-            f"❌ *Network error:* {str(e)}\n"
-            "Please check your connection and try again.",
-            parse_mode="Markdown"
+            _LOGIN_SESSION_ERR,
+            parse_mode=_MD
         )
         return ConversationHandler.END
-    except Exception as e:
-        logger.error(f"Error in verify_otp: {e}")
+    chat_id = update.effective_chat.id
+    headers = {"Authorization": f"Bearer {COPPERX_API_TOKEN}"}
+    logger.info("Verifying OTP for email: %s, OTP: %s, sid: %s", email, otp, sid)
+    response = _request_json(
+        "POST",
+        f"{BASE_URL}/auth/email-otp/authenticate",
+        {"email": email, "otp": otp, "sid": sid},
+        headers,
+        timeout=REQUEST_TIMEOUT
+    )
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("API response status: %s, response: %s", response.status_code, response.text)
+    if response.status_code == 200:
+        body = _json(response)
+        token = body.get("accessToken")
+        # The authenticate response usually embeds the user object, which
+        # is all we need; only fall back to /auth/me when it doesn't, and
+        # fetch that in the background while the success reply goes out.
+        org_id = (body.get("user") or {}).get("organizationId") or body.get("organizationId")
+        me_future = None
+        if org_id is None:
+            me_future = EXECUTOR.submit(
+                SESSION.get, f"{BASE_URL}/auth/me",
+                headers={"Authorization": f"Bearer {token}"}, timeout=REQUEST_TIMEOUT
+            )
         update.message.reply_text(
-            "❌ *An error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            "✅ *Login successful!* You’re now connected to Copperx.\n"
+            "Use the menu below to manage your USDC transactions:",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
         )
+        if me_future is not None:
+            profile = _json(me_future.result(timeout=sum(REQUEST_TIMEOUT)))
+            org_id = profile.get("organizationId")
+        token_expiry = datetime.now() + timedelta(hours=1)
+        save_user(chat_id, email, token, org_id, token_expiry)
+        PUSHER_EXECUTOR.submit(start_pusher, chat_id, token, org_id, context)
+        # Warm the balance cache while the user is still reading the welcome
+        # message; the first /balance tap after login is then a cache hit.
+        EXECUTOR.submit(_prefetch_balances, chat_id, token)
         return ConversationHandler.END
+    else:
+        update.message.reply_text(
+            f"❌ *Invalid OTP:* {_json(response).get('message', 'Unknown error')}\n"
+            "Please try again or request a new OTP with /login.",
+            parse_mode=_MD
+        )
+        return OTP
 
 # Profile and KYC
+@_with_backpressure
+@_safe_handler("profile")
+@_auth_required
 def profile(update, context):
-    try:
-        chat_id = update.message.chat_id
-        reply_func = update.message.reply_text
-        user = get_user(chat_id)
-        user = refresh_token_if_needed(user, chat_id, reply_func)
-        if not user:
-            return
-        headers = {"Authorization": f"Bearer {user['token']}"}
-        response = requests.get(f"{BASE_URL}/auth/me", headers=headers)
-        if response.status_code == 200:
-            try:
-                data = response.json()
-            except ValueError as e:
-                logger.error(f"Error parsing JSON response in profile: {e}, response: {response.text}")
-                reply_func(
-                    "❌ *Error:* Invalid response from Copperx. Please try again or contact support: https://t.me/copperxcommunity/2183",
-                    parse_mode="Markdown"
-                )
-                return
+    chat_id = update.effective_chat.id
+    reply_func = _reply(update)
+    user = context.user_data["_user"]
+    headers = {"Authorization": f"Bearer {user.token}"}
+    response = SESSION.get(f"{BASE_URL}/auth/me", headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 200:
+        data, parse_err = _parse_json(response)
+        if parse_err:
+            logger.error("Error parsing JSON response in profile, response: %s", response.text)
             reply_func(
-                f"👤 *Your Copperx Profile:*\n\n"
-                f"📧 *Email:* {data['email']}\n"
-                f"🏢 *Organization ID:* {data['organizationId']}\n"
-                f"👛 *Wallet Address:* {data['walletAddress']}\n"
-                f"🔐 *Wallet Type:* {data['walletAccountType']}\n\n"
-                "Use the menu below to continue:",
-                parse_mode="Markdown",
-                reply_markup=get_command_menu()
+                "❌ *Error:* Invalid response from Copperx. Please try again or contact support: https://t.me/copperxcommunity/2183",
+                parse_mode=_MD
             )
-        else:
-            try:
-                error_msg = response.json().get('message', 'Unknown error')
-            except ValueError:
-                error_msg = "Invalid response from Copperx"
-            logger.error(f"Error fetching profile for user {chat_id}: {response.status_code}, {error_msg}")
-            reply_func(
-                f"❌ *Error fetching profile:* {error_msg}\n"
-                "Please try again or contact support: https://t.me/copperxcommunity/2183",
-                parse_mode="Markdown"
-            )
-    except requests.RequestException as e:
-        logger.error(f"Network error in profile for user {chat_id}: {e}")
+            return
         reply_func(
-            f"❌ *Network error:* {str(e)}\n"
-            "Please check your connection and try again.",
-            parse_mode="Markdown"
+            f"👤 *Your Copperx Profile:*\n\n"
+            f"📧 *Email:* {data['email']}\n"
+            f"🏢 *Organization ID:* {data['organizationId']}\n"
+            f"👛 *Wallet Address:* {data['walletAddress']}\n"
+            f"🔐 *Wallet Type:* {data['walletAccountType']}\n\n"
+            "Use the menu below to continue:",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
         )
-    except Exception as e:
-        logger.error(f"Unexpected error in profile for user {chat_id}: {e}")
+    else:
+        body, parse_err = _parse_json(response)
+        error_msg = parse_err or body.get('message', 'Unknown error')
+        logger.error("Error fetching profile for user %s: %s, %s", chat_id, response.status_code, error_msg)
         reply_func(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            f"❌ *Error fetching profile:* {error_msg}\n"
+            "Please try again or contact support: https://t.me/copperxcommunity/2183",
+            parse_mode=_MD
         )
 
+@_with_backpressure
+@_safe_handler("kyc")
+@_auth_required
 def kyc(update, context):
-    try:
-        chat_id = update.message.chat_id
-        reply_func = update.message.reply_text
-        user = get_user(chat_id)
-        user = refresh_token_if_needed(user, chat_id, reply_func)
-        if not user:
-            return
-        headers = {"Authorization": f"Bearer {user['token']}"}
-        response = requests.get(f"{BASE_URL}/kycs", headers=headers)
-        if response.status_code == 200:
-            try:
-                kycs = response.json()
-            except ValueError as e:
-                logger.error(f"Error parsing JSON response in kyc for user {chat_id}: {e}, response: {response.text}")
-                reply_func(
-                    "❌ *Error:* Invalid response from Copperx. Please try again or contact support: https://t.me/copperxcommunity/2183",
-                    parse_mode="Markdown"
-                )
-                return
-            if kycs and isinstance(kycs, list) and kycs[0].get("status") == "approved":
-                reply_func(
-                    "✅ *KYC/KYB Approved!*\n"
-                    "You’re all set to perform transactions.\n\n"
-                    "Use the menu below to continue:",
-                    parse_mode="Markdown",
-                    reply_markup=get_command_menu()
-                )
-            else:
-                reply_func(
-                    "⚠️ *KYC/KYB Not Approved.*\n"
-                    "Please complete your KYC/KYB on the Copperx platform to enable full functionality: https://copperx.io\n\n"
-                    "Use the menu below to continue:",
-                    parse_mode="Markdown",
-                    reply_markup=get_command_menu()
-                )
-        else:
-            try:
-                error_msg = response.json().get('message', 'Unknown error')
-            except ValueError:
-                error_msg = "Invalid response from Copperx"
-            logger.error(f"Error checking KYC for user {chat_id}: {response.status_code}, {error_msg}")
+    chat_id = update.effective_chat.id
+    reply_func = _reply(update)
+    user = context.user_data["_user"]
+    with _API_CACHE_LOCK:
+        kycs = _KYC_CACHE.get(chat_id)
+    if kycs is None:
+        headers = {"Authorization": f"Bearer {user.token}"}
+        response = SESSION.get(f"{BASE_URL}/kycs", headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code != 200:
+            body, parse_err = _parse_json(response)
+            error_msg = parse_err or body.get('message', 'Unknown error')
+            logger.error("Error checking KYC for user %s: %s, %s", chat_id, response.status_code, error_msg)
             reply_func(
                 f"❌ *Error checking KYC:* {error_msg}\n"
                 "Please try again or contact support: https://t.me/copperxcommunity/2183",
-                parse_mode="Markdown"
+                parse_mode=_MD
             )
-    except requests.RequestException as e:
-        logger.error(f"Network error in kyc for user {chat_id}: {e}")
+            return
+        kycs, parse_err = _parse_json(response)
+        if parse_err:
+            logger.error("Error parsing JSON response in kyc for user %s, response: %s", chat_id, response.text)
+            reply_func(
+                "❌ *Error:* Invalid response from Copperx. Please try again or contact support: https://t.me/copperxcommunity/2183",
+                parse_mode=_MD
+            )
+            return
+        with _API_CACHE_LOCK:
+            _KYC_CACHE[chat_id] = kycs
+    if kycs and isinstance(kycs, list) and kycs[0].get("status") == "approved":
         reply_func(
-            f"❌ *Network error:* {str(e)}\n"
-            "Please check your connection and try again.",
-            parse_mode="Markdown"
+            "✅ *KYC/KYB Approved!*\n"
+            "You’re all set to perform transactions.\n\n"
+            "Use the menu below to continue:",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
         )
-    except Exception as e:
-        logger.error(f"Unexpected error in kyc for user {chat_id}: {e}")
+    else:
         reply_func(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            "⚠️ *KYC/KYB Not Approved.*\n"
+            "Please complete your KYC/KYB on the Copperx platform to enable full functionality: https://copperx.io\n\n"
+            "Use the menu below to continue:",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
         )
 
 # Wallet Management
+@_with_backpressure
+@_safe_handler("balance")
+@_auth_required
 def balance(update, context):
-    try:
-        chat_id = update.message.chat_id
-        reply_func = update.message.reply_text
-        user = get_user(chat_id)
-        user = refresh_token_if_needed(user, chat_id, reply_func)
-        if not user:
-            return
-        headers = {"Authorization": f"Bearer {user['token']}"}
-        response = requests.get(f"{BASE_URL}/wallets/balances", headers=headers)
-        if response.status_code == 200:
-            try:
-                balances = response.json()
-            except ValueError as e:
-                logger.error(f"Error parsing JSON response in balance for user {chat_id}: {e}, response: {response.text}")
-                reply_func(
-                    "❌ *Error:* Invalid response from Copperx. Please try again or contact support: https://t.me/copperxcommunity/2183",
-                    parse_mode="Markdown"
-                )
-                return
-            if not balances or not isinstance(balances, list):
-                reply_func(
-                    "⚠️ *No wallet balances found.*\n"
-                    "Please deposit USDC to your wallet. Use /deposit for instructions.\n\n"
-                    "Use the menu below to continue:",
-                    parse_mode="Markdown",
-                    reply_markup=get_command_menu()
-                )
-                return
-            message = "💰 *Your Wallet Balances:*\n\n"
-            for b in balances:
-                amount = b.get('amount', '0')
-                network = b.get('network', 'Unknown')
-                message += f"- {amount} USDC on {network}\n"
-            message += "\nUse the menu below to continue:"
-            reply_func(message, parse_mode="Markdown", reply_markup=get_command_menu())
-        else:
-            try:
-                error_msg = response.json().get('message', 'Unknown error')
-            except ValueError:
-                error_msg = "Invalid response from Copperx"
-            logger.error(f"Error fetching balances for user {chat_id}: {response.status_code}, {error_msg}")
+    chat_id = update.effective_chat.id
+    reply_func = _reply(update)
+    user = context.user_data["_user"]
+    with _API_CACHE_LOCK:
+        balances = _BALANCES_CACHE.get(chat_id)
+    if balances is None:
+        headers = {"Authorization": f"Bearer {user.token}"}
+        response = SESSION.get(f"{BASE_URL}/wallets/balances", headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code != 200:
+            body, parse_err = _parse_json(response)
+            error_msg = parse_err or body.get('message', 'Unknown error')
+            logger.error("Error fetching balances for user %s: %s, %s", chat_id, response.status_code, error_msg)
             reply_func(
                 f"❌ *Error fetching balances:* {error_msg}\n"
                 "Please try again or contact support: https://t.me/copperxcommunity/2183",
-                parse_mode="Markdown"
+                parse_mode=_MD
             )
-    except requests.RequestException as e:
-        logger.error(f"Network error in balance for user {chat_id}: {e}")
-        reply_func(
-            f"❌ *Network error:* {str(e)}\n"
-            "Please check your connection and try again.",
-            parse_mode="Markdown"
-        )
-    except Exception as e:
-        logger.error(f"Unexpected error in balance for user {chat_id}: {e}")
+            return
+        balances, parse_err = _parse_json(response)
+        if parse_err:
+            logger.error("Error parsing JSON response in balance for user %s, response: %s", chat_id, response.text)
+            reply_func(
+                "❌ *Error:* Invalid response from Copperx. Please try again or contact support: https://t.me/copperxcommunity/2183",
+                parse_mode=_MD
+            )
+            return
+        with _API_CACHE_LOCK:
+            _BALANCES_CACHE[chat_id] = balances
+    if not balances or not isinstance(balances, list):
         reply_func(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            "⚠️ *No wallet balances found.*\n"
+            "Please deposit USDC to your wallet. Use /deposit for instructions.\n\n"
+            "Use the menu below to continue:",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
         )
+        return
+    lines = [
+        f"- {b.get('amount', '0')} USDC on {b.get('network', 'Unknown')}"
+        for b in balances
+    ]
+    message = "💰 *Your Wallet Balances:*\n\n" + "\n".join(lines) + "\n\nUse the menu below to continue:"
+    reply_func(message, parse_mode=_MD, reply_markup=get_command_menu())
 
+@_with_backpressure
+@_safe_handler("setdefault")
+@_auth_required
 def setdefault(update, context):
-    try:
-        chat_id = update.message.chat_id
-        reply_func = update.message.reply_text
-        user = get_user(chat_id)
-        user = refresh_token_if_needed(user, chat_id, reply_func)
-        if not user:
-            return
-        headers = {"Authorization": f"Bearer {user['token']}"}
-        response = requests.get(f"{BASE_URL}/wallets", headers=headers)
-        if response.status_code == 200:
-            try:
-                wallets = response.json()
-            except ValueError as e:
-                logger.error(f"Error parsing JSON response in setdefault for user {chat_id}: {e}, response: {response.text}")
-                reply_func(
-                    "❌ *Error:* Invalid response from Copperx. Please try again or contact support: https://t.me/copperxcommunity/2183",
-                    parse_mode="Markdown"
-                )
-                return
-            if not wallets or not isinstance(wallets, list):
-                reply_func(
-                    "⚠️ *No wallets found.*\n"
-                    "Please add a wallet on the Copperx platform: https://copperx.io\n\n"
-                    "Use the menu below to continue:",
-                    parse_mode="Markdown",
-                    reply_markup=get_command_menu()
-                )
-                return
-            keyboard = [
-                [InlineKeyboardButton(w.get("network", "Unknown"), callback_data=f"default_{w['id']}")]
-                for w in wallets if w.get("id")
-            ]
-            if not keyboard:
-                reply_func(
-                    "⚠️ *No valid wallets found.*\n"
-                    "Please add a wallet on the Copperx platform: https://copperx.io\n\n"
-                    "Use the menu below to continue:",
-                    parse_mode="Markdown",
-                    reply_markup=get_command_menu()
-                )
-                return
-            reply_func(
-                "🔧 *Select your default wallet:*\n"
-                "This wallet will be used for transactions.",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode="Markdown"
-            )
-        else:
-            try:
-                error_msg = response.json().get('message', 'Unknown error')
-            except ValueError:
-                error_msg = "Invalid response from Copperx"
-            logger.error(f"Error fetching wallets for user {chat_id}: {response.status_code}, {error_msg}")
+    chat_id = update.effective_chat.id
+    reply_func = _reply(update)
+    user = context.user_data["_user"]
+    with _API_CACHE_LOCK:
+        wallets = _WALLETS_CACHE.get(chat_id)
+    if wallets is None:
+        headers = {"Authorization": f"Bearer {user.token}"}
+        response = SESSION.get(f"{BASE_URL}/wallets", headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code != 200:
+            body, parse_err = _parse_json(response)
+            error_msg = parse_err or body.get('message', 'Unknown error')
+            logger.error("Error fetching wallets for user %s: %s, %s", chat_id, response.status_code, error_msg)
             reply_func(
                 f"❌ *Error fetching wallets:* {error_msg}\n"
                 "Please try again or contact support: https://t.me/copperxcommunity/2183",
-                parse_mode="Markdown"
+                parse_mode=_MD
             )
-    except requests.RequestException as e:
-        logger.error(f"Network error in setdefault for user {chat_id}: {e}")
+            return
+        wallets, parse_err = _parse_json(response)
+        if parse_err:
+            logger.error("Error parsing JSON response in setdefault for user %s, response: %s", chat_id, response.text)
+            reply_func(
+                "❌ *Error:* Invalid response from Copperx. Please try again or contact support: https://t.me/copperxcommunity/2183",
+                parse_mode=_MD
+            )
+            return
+        with _API_CACHE_LOCK:
+            _WALLETS_CACHE[chat_id] = wallets
+    if not wallets or not isinstance(wallets, list):
         reply_func(
-            f"❌ *Network error:* {str(e)}\n"
-            "Please check your connection and try again.",
-            parse_mode="Markdown"
+            "⚠️ *No wallets found.*\n"
+            "Please add a wallet on the Copperx platform: https://copperx.io\n\n"
+            "Use the menu below to continue:",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
         )
-    except Exception as e:
-        logger.error(f"Unexpected error in setdefault for user {chat_id}: {e}")
+        return
+    keyboard = [
+        [InlineKeyboardButton(w.get("network", "Unknown"), callback_data=f"default_{w['id']}")]
+        for w in wallets if w.get("id")
+    ]
+    if not keyboard:
         reply_func(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            "⚠️ *No valid wallets found.*\n"
+            "Please add a wallet on the Copperx platform: https://copperx.io\n\n"
+            "Use the menu below to continue:",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
         )
+        return
+    reply_func(
+        "🔧 *Select your default wallet:*\n"
+        "This wallet will be used for transactions.",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode=_MD
+    )
 
+@_per_chat
+@_safe_handler("setdefault_callback")
+@_auth_required
 def setdefault_callback(update, context):
-    try:
-        query = update.callback_query
-        wallet_id = query.data.split("_")[1]
-        chat_id = query.message.chat_id
-        user = get_user(chat_id)
-        user = refresh_token_if_needed(user, chat_id, query.message.reply_text)
-        if not user:
-            return
-        update_default_wallet(chat_id, wallet_id)
-        response = requests.put(
-            f"{BASE_URL}/wallets/default",
-            json={"walletId": wallet_id},
-            headers={"Authorization": f"Bearer {user['token']}"}
-        )
-        if response.status_code == 200:
-            query.edit_message_text(
-                "✅ *Default wallet set successfully!*\n"
-                "Use the menu below to continue:",
-                parse_mode="Markdown",
-                reply_markup=get_command_menu()
-            )
-        else:
-            try:
-                error_msg = response.json().get('message', 'Unknown error')
-            except ValueError:
-                error_msg = "Invalid response from Copperx"
-            logger.error(f"Error setting default wallet for user {chat_id}: {response.status_code}, {error_msg}")
-            query.edit_message_text(
-                f"❌ *Error setting default wallet:* {error_msg}\n"
-                "Please try again or contact support: https://t.me/copperxcommunity/2183",
-                parse_mode="Markdown"
-            )
-    except requests.RequestException as e:
-        logger.error(f"Network error in setdefault_callback for user {chat_id}: {e}")
+    query = update.callback_query
+    wallet_id = query.data.split("_")[1]
+    chat_id = update.effective_chat.id
+    user = context.user_data["_user"]
+    # The local UPDATE and the Copperx PUT hit independent systems, so run
+    # them concurrently and wait for both.
+    previous_wallet = user.default_wallet
+    db_future = EXECUTOR.submit(update_default_wallet, chat_id, wallet_id)
+    put_future = EXECUTOR.submit(
+        _request_json,
+        "PUT",
+        f"{BASE_URL}/wallets/default",
+        {"walletId": wallet_id},
+        {"Authorization": f"Bearer {user.token}"},
+        timeout=REQUEST_TIMEOUT
+    )
+    db_future.result()
+    response = put_future.result()
+    if response.status_code == 200:
+        with _API_CACHE_LOCK:
+            _WALLETS_CACHE.pop(chat_id, None)
+    if response.status_code != 200:
+        # Copperx rejected the change; restore the previous local default
+        # so the two systems stay in sync.
+        update_default_wallet(chat_id, previous_wallet)
+    if response.status_code == 200:
         query.edit_message_text(
-            f"❌ *Network error:* {str(e)}\n"
-            "Please check your connection and try again.",
-            parse_mode="Markdown"
+            "✅ *Default wallet set successfully!*\n"
+            "Use the menu below to continue:",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
         )
-    except Exception as e:
-        logger.error(f"Unexpected error in setdefault_callback for user {chat_id}: {e}")
+    else:
+        body, parse_err = _parse_json(response)
+        error_msg = parse_err or body.get('message', 'Unknown error')
+        logger.error("Error setting default wallet for user %s: %s, %s", chat_id, response.status_code, error_msg)
         query.edit_message_text(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            f"❌ *Error setting default wallet:* {error_msg}\n"
+            "Please try again or contact support: https://t.me/copperxcommunity/2183",
+            parse_mode=_MD
         )
 
+@_with_backpressure
+@_safe_handler("deposit")
+@_auth_required
 def deposit(update, context):
-    try:
-        chat_id = update.message.chat_id
-        reply_func = update.message.reply_text
-        user = get_user(chat_id)
-        user = refresh_token_if_needed(user, chat_id, reply_func)
-        if not user:
-            return
-        reply_func(
-            "💸 *Deposit USDC:*\n\n"
-            "To deposit USDC, please send it to your wallet address on the Copperx platform.\n"
-            "1. Visit https://copperx.io and log in.\n"
-            "2. Navigate to your wallet section.\n"
-            "3. Copy your wallet address and send USDC to it.\n"
-            "4. Use /balance to check your updated balance.\n\n"
-            "You’ll receive a notification here once the deposit is confirmed.\n\n"
-            "Use the menu below to continue:",
-            parse_mode="Markdown",
-            reply_markup=get_command_menu()
-        )
-    except Exception as e:
-        logger.error(f"Error in deposit for user {chat_id}: {e}")
-        reply_func(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
-        )
+    chat_id = update.effective_chat.id
+    reply_func = _reply(update)
+    user = context.user_data["_user"]
+    reply_func(
+        _DEPOSIT_MSG,
+        parse_mode=_MD,
+        reply_markup=get_command_menu()
+    )
 
+@_with_backpressure
+@_safe_handler("history")
+@_auth_required
 def history(update, context):
-    try:
-        chat_id = update.message.chat_id
-        reply_func = update.message.reply_text
-        user = get_user(chat_id)
-        user = refresh_token_if_needed(user, chat_id, reply_func)
-        if not user:
-            return
-        headers = {"Authorization": f"Bearer {user['token']}"}
-        response = requests.get(f"{BASE_URL}/transfers?page=1&limit=10", headers=headers)
-        if response.status_code == 200:
-            try:
-                transfers = response.json()
-            except ValueError as e:
-                logger.error(f"Error parsing JSON response in history for user {chat_id}: {e}, response: {response.text}")
-                reply_func(
-                    "❌ *Error:* Invalid response from Copperx. Please try again or contact support: https://t.me/copperxcommunity/2183",
-                    parse_mode="Markdown"
-                )
-                return
-            if not transfers or not isinstance(transfers, list):
-                reply_func(
-                    "📜 *Transaction History:*\n\n"
-                    "No recent transactions found.\n"
-                    "Use /send or /withdraw to start transacting.\n\n"
-                    "Use the menu below to continue:",
-                    parse_mode="Markdown",
-                    reply_markup=get_command_menu()
-                )
-                return
-            message = "📜 *Last 10 Transactions:*\n\n"
-            for t in transfers:
-                amount = t.get('amount', '0')
-                transfer_type = t.get('type', 'Unknown')
-                created_at = t.get('createdAt', 'Unknown')[:10] if t.get('createdAt') else 'Unknown'
-                message += f"- {amount} USDC ({transfer_type}) on {created_at}\n"
-            message += "\nUse the menu below to continue:"
-            reply_func(message, parse_mode="Markdown", reply_markup=get_command_menu())
-        else:
-            try:
-                error_msg = response.json().get('message', 'Unknown error')
-            except ValueError:
-                error_msg = "Invalid response from Copperx"
-            logger.error(f"Error fetching history for user {chat_id}: {response.status_code}, {error_msg}")
+    chat_id = update.effective_chat.id
+    reply_func = _reply(update)
+    user = context.user_data["_user"]
+    with _API_CACHE_LOCK:
+        transfers = _HISTORY_CACHE.get(chat_id)
+    if transfers is None:
+        headers = {"Authorization": f"Bearer {user.token}"}
+        response = SESSION.get(f"{BASE_URL}/transfers?page=1&limit=10", headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code != 200:
+            body, parse_err = _parse_json(response)
+            error_msg = parse_err or body.get('message', 'Unknown error')
+            logger.error("Error fetching history for user %s: %s, %s", chat_id, response.status_code, error_msg)
             reply_func(
                 f"❌ *Error fetching history:* {error_msg}\n"
                 "Please try again or contact support: https://t.me/copperxcommunity/2183",
-                parse_mode="Markdown"
+                parse_mode=_MD
             )
-    except requests.RequestException as e:
-        logger.error(f"Network error in history for user {chat_id}: {e}")
-        reply_func(
-            f"❌ *Network error:* {str(e)}\n"
-            "Please check your connection and try again.",
-            parse_mode="Markdown"
-        )
-    except Exception as e:
-        logger.error(f"Unexpected error in history for user {chat_id}: {e}")
+            return
+        transfers, parse_err = _parse_json(response)
+        if parse_err:
+            logger.error("Error parsing JSON response in history for user %s, response: %s", chat_id, response.text)
+            reply_func(
+                "❌ *Error:* Invalid response from Copperx. Please try again or contact support: https://t.me/copperxcommunity/2183",
+                parse_mode=_MD
+            )
+            return
+        with _API_CACHE_LOCK:
+            _HISTORY_CACHE[chat_id] = transfers
+    if not transfers or not isinstance(transfers, list):
         reply_func(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            "📜 *Transaction History:*\n\n"
+            "No recent transactions found.\n"
+            "Use /send or /withdraw to start transacting.\n\n"
+            "Use the menu below to continue:",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
         )
+        return
+    lines = [
+        f"- {t.get('amount', '0')} USDC ({t.get('type', 'Unknown')}) on "
+        f"{t['createdAt'][:10] if t.get('createdAt') else 'Unknown'}"
+        for t in transfers
+    ]
+    message = "📜 *Last 10 Transactions:*\n\n" + "\n".join(lines) + "\n\nUse the menu below to continue:"
+    reply_func(message, parse_mode=_MD, reply_markup=get_command_menu())
 
 # Fund Transfers
-def send(update, context):
+# Pre-warm the balance cache after a confirmed transfer. Submitted to EXECUTOR
+# so the refresh overlaps the editMessageText round trip instead of delaying
+# the confirmation; the user's next /balance then hits the cache.
+def _prefetch_balances(chat_id, token):
     try:
-        chat_id = update.message.chat_id
-        reply_func = update.message.reply_text
-        user = get_user(chat_id)
-        user = refresh_token_if_needed(user, chat_id, reply_func)
-        if not user:
-            return ConversationHandler.END
-        keyboard = [
-            [InlineKeyboardButton("Email", callback_data="send_email")],
-            [InlineKeyboardButton("Wallet", callback_data="send_wallet")],
-            [InlineKeyboardButton("Cancel", callback_data="send_cancel")]
-        ]
-        reply_func(
-            "📤 *Send USDC:*\n"
-            "Choose the recipient type:",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode="Markdown"
+        response = SESSION.get(
+            f"{BASE_URL}/wallets/balances",
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=REQUEST_TIMEOUT,
         )
-        return SEND_TYPE
-    except Exception as e:
-        logger.error(f"Error in send for user {chat_id}: {e}")
-        reply_func(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
-        )
-        return ConversationHandler.END
+        if response.status_code != 200:
+            return
+        balances, parse_err = _parse_json(response)
+        if parse_err is None:
+            with _API_CACHE_LOCK:
+                _BALANCES_CACHE[chat_id] = balances
+    except requests.RequestException as e:
+        logger.debug("Balance prefetch for user %s failed: %s", chat_id, e)
 
+@_safe_handler("send", on_error=ConversationHandler.END)
+@_auth_required
+def send(update, context):
+    if update.callback_query:
+        update.callback_query.answer()
+    chat_id = update.effective_chat.id
+    reply_func = _reply(update)
+    user = context.user_data["_user"]
+    reply_func(
+        "📤 *Send USDC:*\n"
+        "Choose the recipient type:",
+        reply_markup=_SEND_TYPE_MENU,
+        parse_mode=_MD
+    )
+    return SEND_TYPE
+
+@_safe_handler("send_type", on_error=ConversationHandler.END)
 def send_type(update, context):
-    try:
-        query = update.callback_query
-        query.answer()
-        context.user_data["send_type"] = query.data.split("_")[1]
-        query.message.reply_text(
-            "📧 *Enter recipient:*\n"
-            "Please provide the email address or wallet address of the recipient:",
-            parse_mode="Markdown"
-        )
-        return SEND_RECIPIENT
-    except Exception as e:
-        logger.error(f"Error in send_type: {e}")
-        query.message.reply_text(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
-        )
-        return ConversationHandler.END
+    query = update.callback_query
+    query.answer()
+    context.user_data["send_type"] = query.data.split("_")[1]
+    query.message.reply_text(
+        "📧 *Enter recipient:*\n"
+        "Please provide the email address or wallet address of the recipient:",
+        parse_mode=_MD
+    )
+    return SEND_RECIPIENT
 
+@_safe_handler("send_recipient", on_error=ConversationHandler.END)
 def send_recipient(update, context):
-    try:
-        recipient = update.message.text
-        send_type = context.user_data.get("send_type")
-        if not send_type:
-            update.message.reply_text(
-                "❌ *Session error.* Please start the send process again with /send.",
-                parse_mode="Markdown"
-            )
-            return ConversationHandler.END
-        if send_type == "email" and not re.match(r"[^@]+@[^@]+\.[^@]+", recipient):
-            update.message.reply_text(
-                "❌ *Invalid email format.* Please enter a valid email address:",
-                parse_mode="Markdown"
-            )
-            return SEND_RECIPIENT
-        context.user_data["recipient"] = recipient
+    recipient = update.message.text
+    send_type = context.user_data.get("send_type")
+    if not send_type:
         update.message.reply_text(
-            "💵 *Enter amount:*\n"
-            "Please specify the amount in USDC to send:",
-            parse_mode="Markdown"
+            _SEND_SESSION_ERR,
+            parse_mode=_MD
         )
-        return SEND_AMOUNT
-    except Exception as e:
-        logger.error(f"Error in send_recipient: {e}")
+        return ConversationHandler.END
+    if send_type == "email" and not _EMAIL_RE.match(recipient):
         update.message.reply_text(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            "❌ *Invalid email format.* Please enter a valid email address:",
+            parse_mode=_MD
         )
-        return ConversationHandler.END
+        return SEND_RECIPIENT
+    context.user_data["recipient"] = recipient
+    update.message.reply_text(
+        "💵 *Enter amount:*\n"
+        "Please specify the amount in USDC to send:",
+        parse_mode=_MD
+    )
+    return SEND_AMOUNT
 
+@_safe_handler("send_amount", on_error=ConversationHandler.END)
 def send_amount(update, context):
+    amount = update.message.text
     try:
-        amount = update.message.text
-        try:
-            amount = float(amount)
-            if amount <= 0:
-                raise ValueError
-        except ValueError:
-            update.message.reply_text(
-                "❌ *Invalid amount.* Please enter a positive number:",
-                parse_mode="Markdown"
-            )
-            return SEND_AMOUNT
-        context.user_data["amount"] = amount
-        recipient = context.user_data.get("recipient")
-        if not recipient:
-            update.message.reply_text(
-                "❌ *Session error.* Please start the send process again with /send.",
-                parse_mode="Markdown"
-            )
-            return ConversationHandler.END
-        keyboard = [
-            [InlineKeyboardButton("Confirm", callback_data="send_confirm")],
-            [InlineKeyboardButton("Cancel", callback_data="send_cancel")]
-        ]
+        amount = float(amount)
+        if amount <= 0:
+            raise ValueError
+    except ValueError:
         update.message.reply_text(
-            f"📤 *Send {amount} USDC to {recipient}?*\n"
-            "⚠️ Please note that transaction fees may apply.",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode="Markdown"
+            "❌ *Invalid amount.* Please enter a positive number:",
+            parse_mode=_MD
         )
-        return SEND_CONFIRM
-    except Exception as e:
-        logger.error(f"Error in send_amount: {e}")
+        return SEND_AMOUNT
+    context.user_data["amount"] = amount
+    recipient = context.user_data.get("recipient")
+    if not recipient:
         update.message.reply_text(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            _SEND_SESSION_ERR,
+            parse_mode=_MD
         )
         return ConversationHandler.END
+    update.message.reply_text(
+        f"📤 *Send {amount} USDC to {_md_escape(recipient)}?*\n"
+        "⚠️ Please note that transaction fees may apply.",
+        reply_markup=_SEND_CONFIRM_MENU,
+        parse_mode=_MD
+    )
+    return SEND_CONFIRM
 
+@_per_chat
+@_safe_handler("send_confirm", on_error=ConversationHandler.END)
+@_auth_required
 def send_confirm(update, context):
-    try:
-        query = update.callback_query
-        query.answer()
-        chat_id = query.message.chat_id
-        user = get_user(chat_id)
-        user = refresh_token_if_needed(user, chat_id, query.message.reply_text)
-        if not user:
-            return ConversationHandler.END
-        send_type = context.user_data.get("send_type")
-        recipient = context.user_data.get("recipient")
-        amount = context.user_data.get("amount")
-        if not all([send_type, recipient, amount]):
-            query.message.reply_text(
-                "❌ *Session error.* Please start the send process again with /send.",
-                parse_mode="Markdown"
-            )
-            return ConversationHandler.END
-        headers = {"Authorization": f"Bearer {user['token']}"}
-        endpoint = "/transfers/send" if send_type == "email" else "/transfers/wallet-withdraw"
-        data = {"amount": amount, "to": recipient} if send_type == "email" else {"amount": amount, "address": recipient}
-        response = requests.post(f"{BASE_URL}{endpoint}", json=data, headers=headers)
-        if response.status_code == 200:
-            query.edit_message_text(
-                "✅ *Transfer successful!*\n"
-                f"You’ve sent {amount} USDC to {recipient}.\n\n"
-                "Use the menu below to continue:",
-                parse_mode="Markdown",
-                reply_markup=get_command_menu()
-            )
-        else:
-            try:
-                error_msg = response.json().get('message', 'Unknown error')
-            except ValueError:
-                error_msg = "Invalid response from Copperx"
-            logger.error(f"Error in send_confirm for user {chat_id}: {response.status_code}, {error_msg}")
-            query.edit_message_text(
-                f"❌ *Transfer failed:* {error_msg}\n"
-                "Please check the recipient details and your balance, then try again.",
-                parse_mode="Markdown"
-            )
+    query = update.callback_query
+    query.answer()
+    chat_id = update.effective_chat.id
+    user = context.user_data["_user"]
+    send_type = context.user_data.get("send_type")
+    recipient = context.user_data.get("recipient")
+    amount = context.user_data.get("amount")
+    if not all([send_type, recipient, amount]):
+        query.message.reply_text(
+            _SEND_SESSION_ERR,
+            parse_mode=_MD
+        )
         return ConversationHandler.END
-    except requests.RequestException as e:
-        logger.error(f"Network error in send_confirm for user {chat_id}: {e}")
+    headers = {"Authorization": f"Bearer {user.token}"}
+    endpoint = "/transfers/send" if send_type == "email" else "/transfers/wallet-withdraw"
+    data = {"amount": amount, "to": recipient} if send_type == "email" else {"amount": amount, "address": recipient}
+    # One key per confirmed (recipient, amount); reused if the user retries
+    # the flow after a network error, dropped once Copperx answers.
+    idem_key = f"idem:{send_type}:{recipient}:{amount}"
+    headers["Idempotency-Key"] = context.user_data.setdefault(idem_key, uuid.uuid4().hex)
+    response = _transfer_post(f"{BASE_URL}{endpoint}", data, headers)
+    context.user_data.pop(idem_key, None)
+    # The flow is over either way; clear its state so the next /send
+    # starts clean instead of replaying stale values.
+    for key in ("send_type", "recipient", "amount"):
+        context.user_data.pop(key, None)
+    if response.status_code == 200:
+        with _API_CACHE_LOCK:
+            _BALANCES_CACHE.pop(chat_id, None)
+            _HISTORY_CACHE.pop(chat_id, None)
+        EXECUTOR.submit(_prefetch_balances, chat_id, user.token)
         query.edit_message_text(
-            f"❌ *Network error:* {str(e)}\n"
-            "Please check your connection and try again.",
-            parse_mode="Markdown"
+            "✅ *Transfer successful!*\n"
+            f"You’ve sent {amount} USDC to {_md_escape(recipient)}.\n\n"
+            "Use the menu below to continue:",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
         )
-        return ConversationHandler.END
-    except Exception as e:
-        logger.error(f"Unexpected error in send_confirm for user {chat_id}: {e}")
+    else:
+        body, parse_err = _parse_json(response)
+        error_msg = parse_err or body.get('message', 'Unknown error')
+        logger.error("Error in send_confirm for user %s: %s, %s", chat_id, response.status_code, error_msg)
         query.edit_message_text(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            f"❌ *Transfer failed:* {error_msg}\n"
+            "Please check the recipient details and your balance, then try again.",
+            parse_mode=_MD
         )
-        return ConversationHandler.END
+    return ConversationHandler.END
 
+@_safe_handler("withdraw", on_error=ConversationHandler.END)
+@_auth_required
 def withdraw(update, context):
-    try:
-        chat_id = update.message.chat_id
-        reply_func = update.message.reply_text
-        user = get_user(chat_id)
-        user = refresh_token_if_needed(user, chat_id, reply_func)
-        if not user:
-            return ConversationHandler.END
-        keyboard = [
-            [InlineKeyboardButton("Cancel", callback_data="withdraw_cancel")]
-        ]
-        reply_func(
-            "🏦 *Withdraw to Bank:*\n"
-            "Please enter the amount in USDC to withdraw:",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode="Markdown"
-        )
-        return WITHDRAW_AMOUNT
-    except Exception as e:
-        logger.error(f"Error in withdraw for user {chat_id}: {e}")
-        reply_func(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
-        )
-        return ConversationHandler.END
+    if update.callback_query:
+        update.callback_query.answer()
+    chat_id = update.effective_chat.id
+    reply_func = _reply(update)
+    user = context.user_data["_user"]
+    reply_func(
+        "🏦 *Withdraw to Bank:*\n"
+        "Please enter the amount in USDC to withdraw:",
+        reply_markup=_WITHDRAW_CANCEL_MENU,
+        parse_mode=_MD
+    )
+    return WITHDRAW_AMOUNT
 
+@_safe_handler("withdraw_amount", on_error=ConversationHandler.END)
 def withdraw_amount(update, context):
+    amount = update.message.text
     try:
-        amount = update.message.text
-        try:
-            amount = float(amount)
-            if amount <= 0:
-                raise ValueError
-        except ValueError:
-            update.message.reply_text(
-                "❌ *Invalid amount.* Please enter a positive number:",
-                parse_mode="Markdown"
-            )
-            return WITHDRAW_AMOUNT
-        context.user_data["withdraw_amount"] = amount
-        keyboard = [
-            [InlineKeyboardButton("Confirm", callback_data="withdraw_confirm")],
-            [InlineKeyboardButton("Cancel", callback_data="withdraw_cancel")]
-        ]
+        amount = float(amount)
+        if amount <= 0:
+            raise ValueError
+    except ValueError:
         update.message.reply_text(
-            f"🏦 *Withdraw {amount} USDC to your bank account?*\n"
-            "⚠️ Please ensure your KYC is approved. Transaction fees may apply.",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode="Markdown"
+            "❌ *Invalid amount.* Please enter a positive number:",
+            parse_mode=_MD
         )
-        return WITHDRAW_CONFIRM
-    except Exception as e:
-        logger.error(f"Error in withdraw_amount: {e}")
-        update.message.reply_text(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
-        )
-        return ConversationHandler.END
+        return WITHDRAW_AMOUNT
+    context.user_data["withdraw_amount"] = amount
+    update.message.reply_text(
+        f"🏦 *Withdraw {amount} USDC to your bank account?*\n"
+        "⚠️ Please ensure your KYC is approved. Transaction fees may apply.",
+        reply_markup=_WITHDRAW_CONFIRM_MENU,
+        parse_mode=_MD
+    )
+    return WITHDRAW_CONFIRM
 
+@_per_chat
+@_safe_handler("withdraw_confirm", on_error=ConversationHandler.END)
+@_auth_required
 def withdraw_confirm(update, context):
-    try:
-        query = update.callback_query
-        query.answer()
-        chat_id = query.message.chat_id
-        user = get_user(chat_id)
-        user = refresh_token_if_needed(user, chat_id, query.message.reply_text)
-        if not user:
-            return ConversationHandler.END
-        amount = context.user_data.get("withdraw_amount")
-        if not amount:
-            query.message.reply_text(
-                "❌ *Session error.* Please start the withdraw process again with /withdraw.",
-                parse_mode="Markdown"
-            )
-            return ConversationHandler.END
-        headers = {"Authorization": f"Bearer {user['token']}"}
-        response = requests.post(
-            f"{BASE_URL}/transfers/offramp",
-            json={"amount": amount},
-            headers=headers
+    query = update.callback_query
+    query.answer()
+    chat_id = update.effective_chat.id
+    user = context.user_data["_user"]
+    amount = context.user_data.get("withdraw_amount")
+    if not amount:
+        query.message.reply_text(
+            _WITHDRAW_SESSION_ERR,
+            parse_mode=_MD
         )
-        if response.status_code == 200:
-            query.edit_message_text(
-                "✅ *Withdrawal requested!*\n"
-                f"You’ve requested to withdraw {amount} USDC to your bank account.\n"
-                "Processing may take a few business days.\n\n"
-                "Use the menu below to continue:",
-                parse_mode="Markdown",
-                reply_markup=get_command_menu()
-            )
-        else:
-            try:
-                error_msg = response.json().get('message', 'Check balance or KYC')
-            except ValueError:
-                error_msg = "Invalid response from Copperx"
-            logger.error(f"Error in withdraw_confirm for user {chat_id}: {response.status_code}, {error_msg}")
-            query.edit_message_text(
-                f"❌ *Withdrawal failed:* {error_msg}\n"
-                "Please ensure your KYC is approved and you have sufficient balance.",
-                parse_mode="Markdown"
-            )
         return ConversationHandler.END
-    except requests.RequestException as e:
-        logger.error(f"Network error in withdraw_confirm for user {chat_id}: {e}")
+    headers = {"Authorization": f"Bearer {user.token}"}
+    idem_key = f"idem:offramp:{amount}"
+    headers["Idempotency-Key"] = context.user_data.setdefault(idem_key, uuid.uuid4().hex)
+    response = _transfer_post(f"{BASE_URL}/transfers/offramp", {"amount": amount}, headers)
+    context.user_data.pop(idem_key, None)
+    context.user_data.pop("withdraw_amount", None)
+    if response.status_code == 200:
+        with _API_CACHE_LOCK:
+            _BALANCES_CACHE.pop(chat_id, None)
+            _HISTORY_CACHE.pop(chat_id, None)
+        EXECUTOR.submit(_prefetch_balances, chat_id, user.token)
         query.edit_message_text(
-            f"❌ *Network error:* {str(e)}\n"
-            "Please check your connection and try again.",
-            parse_mode="Markdown"
+            "✅ *Withdrawal requested!*\n"
+            f"You’ve requested to withdraw {amount} USDC to your bank account.\n"
+            "Processing may take a few business days.\n\n"
+            "Use the menu below to continue:",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
         )
-        return ConversationHandler.END
-    except Exception as e:
-        logger.error(f"Unexpected error in withdraw_confirm for user {chat_id}: {e}")
+    else:
+        body, parse_err = _parse_json(response)
+        error_msg = parse_err or body.get('message', 'Check balance or KYC')
+        logger.error("Error in withdraw_confirm for user %s: %s, %s", chat_id, response.status_code, error_msg)
         query.edit_message_text(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            f"❌ *Withdrawal failed:* {error_msg}\n"
+            "Please ensure your KYC is approved and you have sufficient balance.",
+            parse_mode=_MD
         )
-        return ConversationHandler.END
+    return ConversationHandler.END
+
+# Keys the conversation flows write into user_data; cleared on timeout so
+# abandoned conversations don't accumulate per-user state.
+_FLOW_KEYS = ("email", "sid", "send_type", "recipient", "amount", "withdraw_amount")
+_CONVERSATION_TIMEOUT = int(os.getenv("CONVERSATION_TIMEOUT", "300"))
+
+def conversation_timeout(update, context):
+    for key in _FLOW_KEYS:
+        context.user_data.pop(key, None)
+    try:
+        _reply(update)(
+            "⌛ *Session timed out.* Please start again from the menu.",
+            parse_mode=_MD,
+            reply_markup=get_command_menu()
+        )
+    except (KeyError, ValueError) as e:
+        logger.error("Error in conversation_timeout: %s", e, exc_info=True)
+    return ConversationHandler.END
 
 def cancel(update, context):
     try:
-        update.message.reply_text(
+        for key in _FLOW_KEYS:
+            context.user_data.pop(key, None)
+        _reply(update)(
             "❌ *Operation cancelled.*\n"
             "Use the menu below to continue:",
-            parse_mode="Markdown",
+            parse_mode=_MD,
             reply_markup=get_command_menu()
         )
         return ConversationHandler.END
-    except Exception as e:
-        logger.error(f"Error in cancel: {e}")
+    except (KeyError, ValueError) as e:
+        logger.error("Error in cancel: %s", e, exc_info=True)
         update.message.reply_text(
-            "❌ *An unexpected error occurred.* Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            _UNEXPECTED_ERROR_MSG,
+            parse_mode=_MD
         )
         return ConversationHandler.END
 
-# Pusher for Deposit Notifications
+# Pusher for Deposit Notifications. One client is shared by every login and
+# each organization gets a single _OrgEntry holding its channel subscription
+# and subscriber set; logins just register their chat_id there, so N users
+# in an org mean one socket and one binding instead of N of each.
+_PUSHER_LOCK = threading.Lock()
+_PUSHER_CLIENT = None
+# One entry per organization: the subscribed channel and the chats to fan
+# deposit events out to.
+_OrgEntry = collections.namedtuple("_OrgEntry", ["channel", "chat_ids"])
+_ORGS = {}
+
+# Outbound queue for deposit broadcasts. A single paced sender thread drains
+# it at BROADCAST_RATE messages/s (default 25, under Telegram's ~30 msg/s
+# bot-wide cap) so a burst of deposits can't trigger a 429 flood-wait, and
+# the Pusher callback returns as soon as the messages are queued.
+_SEND_QUEUE = queue.Queue()
+_SEND_INTERVAL = 1.0 / float(os.getenv("BROADCAST_RATE", "25"))
+# Deposits that land within this window are merged into one message per chat,
+# so a burst of events costs one Bot API call per recipient, not one per event.
+_COALESCE_WINDOW = float(os.getenv("BROADCAST_COALESCE_WINDOW", "0.5"))
+_SENDER_LOCK = threading.Lock()
+_SENDER_STARTED = False
+
+def _format_deposits(events):
+    if len(events) == 1:
+        amount, network = events[0]
+        return (
+            "💰 *New Deposit Received!*\n\n"
+            f"Amount: {amount} USDC\n"
+            f"Network: {network}\n\n"
+            "Use /balance to check your updated balance."
+        )
+    lines = [f"- {amount} USDC on {network}" for amount, network in events]
+    return (
+        f"💰 *{len(events)} New Deposits Received!*\n\n"
+        + "\n".join(lines)
+        + "\n\nUse /balance to check your updated balance."
+    )
+
+def _broadcast_sender():
+    while True:
+        bot, chat_id, event = _SEND_QUEUE.get()
+        # Drain whatever else arrives inside the coalescing window and group
+        # it per chat before sending.
+        batch = collections.defaultdict(list)
+        batch[chat_id].append(event)
+        deadline = time.monotonic() + _COALESCE_WINDOW
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                bot, chat_id, event = _SEND_QUEUE.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch[chat_id].append(event)
+        for chat_id, events in batch.items():
+            try:
+                bot.send_message(chat_id, _format_deposits(events), parse_mode=_MD)
+            except RetryAfter as e:
+                # Telegram told us exactly how long to back off; honour it,
+                # then requeue the events instead of dropping them.
+                logger.warning("Flood control hit, backing off %ss", e.retry_after)
+                time.sleep(e.retry_after)
+                for event in events:
+                    _SEND_QUEUE.put((bot, chat_id, event))
+            except Exception as e:
+                logger.error("Error sending deposit notification to %s: %s", chat_id, e)
+            time.sleep(_SEND_INTERVAL)
+
+def _enqueue_broadcast(bot, chat_id, event):
+    global _SENDER_STARTED
+    if not _SENDER_STARTED:
+        with _SENDER_LOCK:
+            if not _SENDER_STARTED:
+                threading.Thread(target=_broadcast_sender, daemon=True).start()
+                _SENDER_STARTED = True
+    _SEND_QUEUE.put((bot, chat_id, event))
+
+def _broadcast_deposit(bot, org_id, data):
+    """Fan a deposit event out to every chat subscribed to the organization."""
+    with _PUSHER_LOCK:
+        entry = _ORGS.get(org_id)
+        chat_ids = list(entry.chat_ids) if entry else []
+    event = (data.get("amount", "0"), data.get("network", "Unknown"))
+    # A deposit changes both the balance and the first history page, so drop
+    # the cached copies for every subscribed chat before fanning out.
+    with _API_CACHE_LOCK:
+        for chat_id in chat_ids:
+            _BALANCES_CACHE.pop(chat_id, None)
+            _HISTORY_CACHE.pop(chat_id, None)
+    for chat_id in chat_ids:
+        _enqueue_broadcast(bot, chat_id, event)
+
+def _unsubscribe_chat(chat_id):
+    """Drop a chat from every org's deposit fan-out (called on logout)."""
+    with _PUSHER_LOCK:
+        for entry in _ORGS.values():
+            entry.chat_ids.discard(chat_id)
+
+def _get_pusher():
+    """Lazily create, connect and return the shared Pusher client.
+
+    Must be called with _PUSHER_LOCK held."""
+    global _PUSHER_CLIENT
+    if _PUSHER_CLIENT is None:
+        _PUSHER_CLIENT = Pusher(
+            app_id=PUSHER_APP_ID,
+            key=PUSHER_KEY,
+            secret=PUSHER_SECRET,
+            cluster=PUSHER_CLUSTER
+        )
+        threading.Thread(target=_PUSHER_CLIENT.connect, name="pusher-connect", daemon=True).start()
+    return _PUSHER_CLIENT
+
 def start_pusher(chat_id, token, org_id, context):
     try:
         if not all([PUSHER_KEY, PUSHER_CLUSTER, PUSHER_APP_ID, PUSHER_SECRET]):
@@ -1128,54 +1507,121 @@ def start_pusher(chat_id, token, org_id, context):
                 chat_id,
                 "⚠️ *Deposit notifications are disabled.* Pusher credentials are missing.\n"
                 "You can still use the bot, but you won’t receive real-time deposit updates.",
-                parse_mode="Markdown"
+                parse_mode=_MD
             )
             return
-        pusher_client = Pusher(
-            app_id=PUSHER_APP_ID,
-            key=PUSHER_KEY,
-            secret=PUSHER_SECRET,
-            cluster=PUSHER_CLUSTER
-        )
-        channel = pusher_client.subscribe(f"private-org-{org_id}")
-        channel.bind("deposit", lambda data: context.bot.send_message(
-            chat_id,
-            f"💰 *New Deposit Received!*\n\n"
-            f"Amount: {data.get('amount', '0')} USDC\n"
-            f"Network: {data.get('network', 'Unknown')}\n\n"
-            "Use /balance to check your updated balance.",
-            parse_mode="Markdown"
-        ))
-        threading.Thread(target=lambda: pusher_client.connect(), daemon=True).start()
-        logger.info(f"Pusher connected for chat_id {chat_id} on organization {org_id}")
+        with _PUSHER_LOCK:
+            # A re-login may be for a different account: drop any previous
+            # org membership first so the chat moves to its new org instead
+            # of keeping the old one's deposit notifications.
+            for other in _ORGS.values():
+                other.chat_ids.discard(chat_id)
+            client = _get_pusher()
+            entry = _ORGS.get(org_id)
+            if entry is None:
+                channel = client.subscribe(f"private-org-{org_id}")
+                channel.bind(
+                    "deposit",
+                    lambda data, bot=context.bot: _broadcast_deposit(bot, org_id, data)
+                )
+                entry = _OrgEntry(channel, set())
+                _ORGS[org_id] = entry
+            entry.chat_ids.add(chat_id)
+        logger.info("Pusher subscribed for chat_id %s on organization %s", chat_id, org_id)
     except Exception as e:
-        logger.error(f"Error in start_pusher for chat_id {chat_id}: {e}")
+        logger.error("Error in start_pusher for chat_id %s: %s", chat_id, e, exc_info=True)
         context.bot.send_message(
             chat_id,
             f"⚠️ *Error setting up deposit notifications:* {str(e)}\n"
             "Please contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            parse_mode=_MD
         )
 
 # Error handler
 def error_handler(update, context):
-    logger.error(f"Update {update} caused error {context.error}")
+    logger.error("Update %s caused error %s", update, context.error, exc_info=context.error)
     try:
-        chat_id = update.message.chat_id if update.message else update.callback_query.message.chat_id
-        reply_func = update.message.reply_text if update.message else update.callback_query.message.reply_text
+        chat_id = update.effective_chat.id
+        reply_func = _reply(update)
         reply_func(
             f"❌ *An error occurred:* {str(context.error)}\n"
             "Please try again or contact support: https://t.me/copperxcommunity/2183",
-            parse_mode="Markdown"
+            parse_mode=_MD
         )
     except Exception as e:
-        logger.error(f"Error in error_handler: {e}")
+        logger.error("Error in error_handler: %s", e, exc_info=True)
 
 # Main function
+# Menu taps dispatch straight into the command handlers instead of echoing
+# "/command" back through the Bot API for the user to resend. login, send and
+# withdraw are absent on purpose: they enter their conversations through the
+# callback entry points registered in main().
+MENU_DISPATCH = {
+    "profile": profile,
+    "kyc": kyc,
+    "balance": balance,
+    "setdefault": setdefault,
+    "deposit": deposit,
+    "history": history,
+    "help": help_command,
+}
+
+# Single lookup table for the stateless commands. One CommandHandler doing a
+# dict dispatch means the Dispatcher runs one check_update for all nine
+# commands instead of scanning nine separate handlers per update.
+COMMAND_DISPATCH = {
+    "start": start,
+    "help": help_command,
+    "logout": logout,
+    "profile": profile,
+    "kyc": kyc,
+    "balance": balance,
+    "setdefault": setdefault,
+    "deposit": deposit,
+    "history": history,
+}
+
+def dispatch_command(update, context):
+    command = update.message.text.split()[0][1:].split("@")[0].lower()
+    return COMMAND_DISPATCH[command](update, context)
+
+class LiteralCallbackHandler(CallbackQueryHandler):
+    """CallbackQueryHandler matched by string equality or prefix instead of a
+    regex. Every pattern registered below is a literal or a literal prefix,
+    so a plain compare avoids a re.Pattern.match on each button press."""
+
+    def __init__(self, callback, data=None, prefix=None, **kwargs):
+        super().__init__(callback, **kwargs)
+        self._data = data
+        self._prefix = prefix
+
+    def check_update(self, update):
+        if not (isinstance(update, Update) and update.callback_query):
+            return False
+        data = update.callback_query.data
+        if data is None:
+            return False
+        if self._data is not None:
+            return data == self._data
+        return data.startswith(self._prefix)
+
 def main():
     try:
-        init_db()
-        updater = Updater(TELEGRAM_TOKEN, use_context=True)
+        # init_db only talks to MySQL and nothing below needs its result
+        # until handlers run, so let it overlap the Updater/Bot API setup.
+        init_db_future = EXECUTOR.submit(init_db)
+        # Size the Bot API connection pool for concurrent sends: run_async
+        # workers plus the broadcast sender all POST to api.telegram.org, and
+        # the v13 default pool of 4 would serialize them.
+        updater = Updater(
+            TELEGRAM_TOKEN,
+            use_context=True,
+            workers=int(os.getenv("PTB_WORKERS", "32")),
+            request_kwargs={"con_pool_size": int(os.getenv("TELEGRAM_CON_POOL_SIZE", "64"))},
+            # Nearly every reply carries the support t.me link; stop Telegram
+            # from generating a preview for it on each message.
+            defaults=Defaults(disable_web_page_preview=True)
+        )
         dp = updater.dispatcher
         bot = updater.bot
         commands = [
@@ -1193,54 +1639,81 @@ def main():
             ("help", "Show this message")
         ]
         bot.set_my_commands([(cmd, desc) for cmd, desc in commands])
-        dp.add_handler(CommandHandler("start", start))
-        dp.add_handler(CommandHandler("help", help_command))
-        dp.add_handler(CallbackQueryHandler(menu_callback, pattern="^cmd_"))
-        dp.add_handler(CommandHandler("logout", logout))
-        dp.add_handler(CommandHandler("profile", profile))
-        dp.add_handler(CommandHandler("kyc", kyc))
-        dp.add_handler(CommandHandler("balance", balance))
-        dp.add_handler(CommandHandler("setdefault", setdefault))
-        dp.add_handler(CallbackQueryHandler(setdefault_callback, pattern="^default_"))
-        dp.add_handler(CommandHandler("deposit", deposit))
-        dp.add_handler(CommandHandler("history", history))
+        init_db_future.result()
+        dp.add_handler(CommandHandler(list(COMMAND_DISPATCH), dispatch_command, run_async=True))
+        dp.add_handler(LiteralCallbackHandler(setdefault_callback, prefix="default_", run_async=True))
         send_conv = ConversationHandler(
-            entry_points=[CommandHandler("send", send)],
+            entry_points=[CommandHandler("send", send),
+                          LiteralCallbackHandler(send, data="cmd_send")],
             states={
-                SEND_TYPE: [CallbackQueryHandler(send_type, pattern="^send_")],
+                SEND_TYPE: [LiteralCallbackHandler(send_type, prefix="send_")],
                 SEND_RECIPIENT: [MessageHandler(Filters.text & ~Filters.command, send_recipient)],
                 SEND_AMOUNT: [MessageHandler(Filters.text & ~Filters.command, send_amount)],
-                SEND_CONFIRM: [CallbackQueryHandler(send_confirm, pattern="^send_confirm$"),
-                              CallbackQueryHandler(cancel, pattern="^send_cancel$")]
+                SEND_CONFIRM: [LiteralCallbackHandler(send_confirm, data="send_confirm"),
+                              LiteralCallbackHandler(cancel, data="send_cancel")],
+                ConversationHandler.TIMEOUT: [MessageHandler(Filters.all, conversation_timeout),
+                                              CallbackQueryHandler(conversation_timeout)]
             },
-            fallbacks=[CommandHandler("cancel", cancel)]
+            fallbacks=[CommandHandler("cancel", cancel)],
+            conversation_timeout=_CONVERSATION_TIMEOUT
         )
         dp.add_handler(send_conv)
         withdraw_conv = ConversationHandler(
-            entry_points=[CommandHandler("withdraw", withdraw)],
+            entry_points=[CommandHandler("withdraw", withdraw),
+                          LiteralCallbackHandler(withdraw, data="cmd_withdraw")],
             states={
                 WITHDRAW_AMOUNT: [MessageHandler(Filters.text & ~Filters.command, withdraw_amount)],
-                WITHDRAW_CONFIRM: [CallbackQueryHandler(withdraw_confirm, pattern="^withdraw_confirm$"),
-                                  CallbackQueryHandler(cancel, pattern="^withdraw_cancel$")]
+                WITHDRAW_CONFIRM: [LiteralCallbackHandler(withdraw_confirm, data="withdraw_confirm"),
+                                  LiteralCallbackHandler(cancel, data="withdraw_cancel")],
+                ConversationHandler.TIMEOUT: [MessageHandler(Filters.all, conversation_timeout),
+                                              CallbackQueryHandler(conversation_timeout)]
             },
-            fallbacks=[CommandHandler("cancel", cancel)]
+            fallbacks=[CommandHandler("cancel", cancel)],
+            conversation_timeout=_CONVERSATION_TIMEOUT
         )
         dp.add_handler(withdraw_conv)
         login_conv = ConversationHandler(
-            entry_points=[CommandHandler("login", login)],
+            entry_points=[CommandHandler("login", login),
+                          LiteralCallbackHandler(login, data="cmd_login")],
             states={
                 EMAIL: [MessageHandler(Filters.text & ~Filters.command, get_email)],
-                OTP: [MessageHandler(Filters.text & ~Filters.command, verify_otp)]
+                OTP: [MessageHandler(Filters.text & ~Filters.command, verify_otp)],
+                ConversationHandler.TIMEOUT: [MessageHandler(Filters.all, conversation_timeout),
+                                              CallbackQueryHandler(conversation_timeout)]
             },
-            fallbacks=[CommandHandler("cancel", cancel)]
+            fallbacks=[CommandHandler("cancel", cancel)],
+            conversation_timeout=_CONVERSATION_TIMEOUT
         )
         dp.add_handler(login_conv)
+        # Registered after the conversations so their cmd_login/cmd_send/
+        # cmd_withdraw entry points take precedence over the generic menu.
+        dp.add_handler(LiteralCallbackHandler(menu_callback, prefix="cmd_", run_async=True))
         dp.add_error_handler(error_handler)
-        updater.start_polling()
-        print("Bot is running...")
+        webhook_url = os.getenv("WEBHOOK_URL")
+        if webhook_url:
+            # Webhook mode: Telegram pushes updates to us over a keep-alive
+            # connection instead of the bot long-polling getUpdates, cutting
+            # idle traffic and the polling delay from every update.
+            # The URL path doubles as the shared secret; prefer a dedicated
+            # WEBHOOK_SECRET so the bot token never shows up in proxy logs.
+            url_path = os.getenv("WEBHOOK_SECRET", TELEGRAM_TOKEN)
+            updater.start_webhook(
+                listen="0.0.0.0",
+                port=int(os.getenv("PORT", "8443")),
+                url_path=url_path
+            )
+            updater.bot.set_webhook(
+                url=f"{webhook_url.rstrip('/')}/{url_path}",
+                max_connections=40,
+                allowed_updates=["message", "callback_query"]
+            )
+            print("Bot is running (webhook mode)...")
+        else:
+            updater.start_polling(allowed_updates=["message", "callback_query"])
+            print("Bot is running...")
         updater.idle()
     except Exception as e:
-        logger.error(f"Error in main: {e}")
+        logger.error("Error in main: %s", e, exc_info=True)
         print(f"Bot crashed: {e}")
 
 if __name__ == "__main__":